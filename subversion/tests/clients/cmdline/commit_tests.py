@@ -109,14 +109,14 @@ def make_standard_slew_of_changes(wc_dir):
   svntest.main.file_append(os.path.join('A', 'B', 'E', 'bloo'), "hi")
   svntest.main.file_append(os.path.join('A', 'D', 'H', 'gloo'), "hello")
   svntest.main.file_append(os.path.join('Q', 'floo'), "yo")
-  svntest.main.run_svn(None, 'add', os.path.join('A', 'B', 'E', 'bloo'))
-  svntest.main.run_svn(None, 'add', os.path.join('A', 'D', 'H', 'gloo'))
-  svntest.main.run_svn(None, 'add', os.path.join('Q', 'floo'))
+  svntest.main.run_svn(None, 'add', os.path.join('A', 'B', 'E', 'bloo'),
+                       os.path.join('A', 'D', 'H', 'gloo'),
+                       os.path.join('Q', 'floo'))
   
   # Remove three files
-  svntest.main.run_svn(None, 'rm', os.path.join('A', 'D', 'G', 'rho'))
-  svntest.main.run_svn(None, 'rm', os.path.join('A', 'D', 'H', 'chi'))
-  svntest.main.run_svn(None, 'rm', os.path.join('A', 'D', 'gamma'))
+  svntest.main.run_svn(None, 'rm', os.path.join('A', 'D', 'G', 'rho'),
+                       os.path.join('A', 'D', 'H', 'chi'),
+                       os.path.join('A', 'D', 'gamma'))
   
   # Replace one of the removed files
   svntest.main.run_svn(None, 'add', os.path.join('A', 'D', 'H', 'chi'))
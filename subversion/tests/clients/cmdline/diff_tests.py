@@ -17,7 +17,7 @@
 ######################################################################
 
 # General modules
-import string, sys, re, os.path
+import string, re, os.path
 
 # Our testing module
 import svntest
@@ -29,14 +29,28 @@ import svntest
 # Looks for the correct filenames and a suitable number of +/- lines
 # depending on whether this is an addition, modification or deletion.
 
+# Content lines in a diff always start with ' ', '+' or '-', so any
+# line starting with 'Index:' begins a file diff.
+index_line_re = re.compile('^Index:', re.M)
+add_line_re = re.compile('^\\+')
+sub_line_re = re.compile('^-')
+
+# The checkers are called over and over with the same few names, so
+# keep the compiled header patterns for each name around.
+diff_header_res = {}
+
+def get_diff_header_res(name):
+  "return the compiled Index: and --- patterns for NAME"
+
+  if not diff_header_res.has_key(name):
+    diff_header_res[name] = (re.compile('^Index: (\\./)?' + name),
+                             re.compile('^--- (\\./)?' + name))
+  return diff_header_res[name]
+
 def check_diff_output(diff_output, name, diff_type):
   "check diff output"
 
-  i_re = re.compile('^Index:')
-  d_re = re.compile('^Index: (\\./)?' + name)
-  p_re = re.compile('^--- (\\./)?' + name)
-  add_re = re.compile('^\\+')
-  sub_re = re.compile('^-')
+  d_re, p_re = get_diff_header_res(name)
 
   i = 0
   while i < len(diff_output) - 4:
@@ -49,10 +63,10 @@ def check_diff_output(diff_output, name, diff_type):
       i += 4
       add_lines = 0
       sub_lines = 0
-      while i < len(diff_output) and not i_re.match(diff_output[i]):
-        if add_re.match(diff_output[i][0]):
+      while i < len(diff_output) and not index_line_re.match(diff_output[i]):
+        if add_line_re.match(diff_output[i][0]):
           add_lines += 1
-        if sub_re.match(diff_output[i][0]):
+        if sub_line_re.match(diff_output[i][0]):
           sub_lines += 1
         i += 1
 
@@ -75,17 +89,37 @@ def check_diff_output(diff_output, name, diff_type):
 def count_diff_output(diff_output):
   "count the number of file diffs in the output"
 
-  i_re = re.compile('Index:')
-  diff_count = 0
-  i = 0
-  while i < len(diff_output) - 4:
-    if i_re.match(diff_output[i]):
-      i += 4
-      diff_count += 1
-    else:
-      i += 1
+  # One scan over the whole output beats a match() per line.  An
+  # Index: line counts only if at least four more lines follow it.
+  return len(index_line_re.findall(string.join(diff_output[:-4], '')))
+
+# The change checkers below differ only in which files they look for,
+# so they are all made by diff_checker().
+
+def check_diffs(diff_output, expected):
+  "check diff output for each (name, diff_type) pair in EXPECTED"
+
+  for name, diff_type in expected:
+    if check_diff_output(diff_output, name, diff_type):
+      return 1
+
+  return 0
+
+def diff_checker(*expected):
+  "return a checker for the (name, diff_type) pairs in EXPECTED"
+
+  return lambda diff_output, expected=expected: \
+         check_diffs(diff_output, expected)
+
+######################################################################
+# run a diff from within a working copy
+
+def diff_in_wc(wc_dir, *args):
+  "run 'svn diff ARGS' from within WC_DIR and return the output"
 
-  return diff_count
+  diff_output, err_output = svntest.main.run_svn(None, 'diff', cwd=wc_dir,
+                                                 *args)
+  return diff_output
 
 ######################################################################
 # diff on a repository subset and check the output
@@ -93,46 +127,45 @@ def count_diff_output(diff_output):
 def diff_check_repo_subset(wc_dir, repo_subset, check_fn, do_diff_r):
   "diff and check for part of the repository"
 
-  was_cwd = os.getcwd()
-  os.chdir(wc_dir)
-
-  diff_output, err_output = svntest.main.run_svn(None, 'diff', repo_subset)
-  if check_fn(diff_output):
-    os.chdir(was_cwd)
+  if check_fn(diff_in_wc(wc_dir, repo_subset)):
     return 1
 
   if do_diff_r:
-    diff_output, err_output = svntest.main.run_svn(None, 'diff', '-rHEAD',
-                                                   repo_subset)
-    if check_fn(diff_output):
-      os.chdir(was_cwd)
+    if check_fn(diff_in_wc(wc_dir, '-rHEAD', repo_subset)):
       return 1
 
-  os.chdir(was_cwd)
   return 0
 
 ######################################################################
 # Changes makers and change checkers
 
-def update_a_file():
+# Paths, relative to the working copy, that the changes touch.  The
+# checkers use them over and over, so join them once.
+B_path = os.path.join('A', 'B')
+alpha_path = os.path.join('A', 'B', 'E', 'alpha')
+theta_path = os.path.join('A', 'B', 'E', 'theta')
+T_path = os.path.join('A', 'B', 'T')
+phi_path = os.path.join('A', 'B', 'T', 'phi')
+rho_path = os.path.join('A', 'D', 'G', 'rho')
+gamma_path = os.path.join('A', 'D', 'gamma')
+tau_path = os.path.join('A', 'D', 'G', 'tau')
+psi_path = os.path.join('A', 'D', 'H', 'psi')
+
+def update_a_file(wc_dir):
   "update a file"
-  svntest.main.file_append(os.path.join('A', 'B', 'E', 'alpha'), "new atext")
+  svntest.main.file_append(os.path.join(wc_dir, alpha_path), "new atext")
   return 0
 
-def check_update_a_file(diff_output):
-  "check diff for update a file"
-  return check_diff_output(diff_output,
-                           os.path.join('A', 'B', 'E', 'alpha'),
-                           'M')
+check_update_a_file = diff_checker((alpha_path, 'M'))
 
 def diff_check_update_a_file_repo_subset(wc_dir):
   "diff and check update a file for a rpeository subset"
 
-  repo_subset = os.path.join('A', 'B')
+  repo_subset = B_path
   if diff_check_repo_subset(wc_dir, repo_subset, check_update_a_file, 1):
     return 1
   
-  repo_subset = os.path.join('A', 'B', 'E', 'alpha')
+  repo_subset = alpha_path
   if diff_check_repo_subset(wc_dir, repo_subset, check_update_a_file, 1):
     return 1
 
@@ -141,79 +174,59 @@ def diff_check_update_a_file_repo_subset(wc_dir):
 
 #----------------------------------------------------------------------
 
-def add_a_file():
+def add_a_file(wc_dir):
   "add a file"
-  svntest.main.file_append(os.path.join('A', 'B', 'E', 'theta'), "theta")
-  svntest.main.run_svn(None, 'add', os.path.join('A', 'B', 'E', 'theta'))
+  svntest.main.file_append(os.path.join(wc_dir, theta_path), "theta")
+  svntest.main.run_svn(None, 'add', theta_path, cwd=wc_dir)
   return 0
 
-def check_add_a_file(diff_output):
-  "check diff for add a file"
-  return check_diff_output(diff_output,
-                           os.path.join('A', 'B', 'E', 'theta'),
-                           'A')
+check_add_a_file = diff_checker((theta_path, 'A'))
 
-def check_add_a_file_reverse(diff_output):
-  "check diff for add a file"
-  return check_diff_output(diff_output,
-                           os.path.join('A', 'B', 'E', 'theta'),
-                           'D')
+check_add_a_file_reverse = diff_checker((theta_path, 'D'))
 
 def diff_check_add_a_file_repo_subset(wc_dir):
   "diff and check add a file for a repository subset"
 
-  repo_subset = os.path.join('A', 'B')
+  repo_subset = B_path
   if diff_check_repo_subset(wc_dir, repo_subset, check_add_a_file, 1):
     return 1
   
-  repo_subset = os.path.join('A', 'B', 'E', 'theta')
+  repo_subset = theta_path
   ### TODO: diff -rHEAD doesn't work for added file
   if diff_check_repo_subset(wc_dir, repo_subset, check_add_a_file, 0):
     return 1
 
-def update_added_file():
-  svntest.main.file_append(os.path.join('A', 'B', 'E', 'theta'), "net ttext")
+def update_added_file(wc_dir):
+  svntest.main.file_append(os.path.join(wc_dir, theta_path), "net ttext")
   "update added file"
   return 0
 
-def check_update_added_file(diff_output):
-  "check diff for update of added file"
-  return check_diff_output(diff_output,
-                           os.path.join('A', 'B', 'E', 'theta'),
-                           'M')
+check_update_added_file = diff_checker((theta_path, 'M'))
 
 #----------------------------------------------------------------------
 
-def add_a_file_in_a_subdir():
+def add_a_file_in_a_subdir(wc_dir):
   "add a file in a subdir"
-  os.mkdir(os.path.join('A', 'B', 'T'))
-  svntest.main.run_svn(None, 'add', os.path.join('A', 'B', 'T'))
-  svntest.main.file_append(os.path.join('A', 'B', 'T', 'phi'), "phi")
-  svntest.main.run_svn(None, 'add', os.path.join('A', 'B', 'T', 'phi'))
+  os.mkdir(os.path.join(wc_dir, T_path))
+  svntest.main.file_append(os.path.join(wc_dir, phi_path), "phi")
+  # 'svn add' handles its targets in order, so one run does both.
+  svntest.main.run_svn(None, 'add', T_path, phi_path, cwd=wc_dir)
   return 0
 
-def check_add_a_file_in_a_subdir(diff_output):
-  "check diff for add a file in a subdir"
-  return check_diff_output(diff_output,
-                           os.path.join('A', 'B', 'T', 'phi'),
-                           'A')
+check_add_a_file_in_a_subdir = diff_checker((phi_path, 'A'))
 
-def check_add_a_file_in_a_subdir_reverse(diff_output):
-  "check diff for add a file in a subdir"
-  return check_diff_output(diff_output,
-                           os.path.join('A', 'B', 'T', 'phi'),
-                           'D')
+check_add_a_file_in_a_subdir_reverse = diff_checker((phi_path, 'D'))
 
 def diff_check_add_a_file_in_a_subdir_repo_subset(wc_dir):
   "diff and check add a file in a subdir for a repository subset"
 
-  repo_subset = os.path.join('A', 'B', 'T')
+  repo_subset = T_path
   ### TODO: diff -rHEAD doesn't work for added subdir
   if diff_check_repo_subset(wc_dir, repo_subset,
                             check_add_a_file_in_a_subdir, 0):
     return 1
   
-  repo_subset = os.path.join('A', 'B', 'T', 'phi')
+  repo_subset = phi_path
   ### TODO: diff -rHEAD doesn't work for added file in subdir
   if diff_check_repo_subset(wc_dir, repo_subset,
                             check_add_a_file_in_a_subdir, 0):
@@ -221,84 +234,59 @@ def diff_check_add_a_file_in_a_subdir_repo_subset(wc_dir):
 
 #----------------------------------------------------------------------
 
-def replace_a_file():
+def replace_a_file(wc_dir):
   "replace a file"
-  svntest.main.run_svn(None, 'rm', os.path.join('A', 'D', 'G', 'rho'))
-  svntest.main.file_append(os.path.join('A', 'D', 'G', 'rho'), "new rho")
-  svntest.main.run_svn(None, 'add', os.path.join('A', 'D', 'G', 'rho'))
+  svntest.main.run_svn(None, 'rm', rho_path, cwd=wc_dir)
+  svntest.main.file_append(os.path.join(wc_dir, rho_path), "new rho")
+  svntest.main.run_svn(None, 'add', rho_path, cwd=wc_dir)
   return 0
 
-def check_replace_a_file(diff_output):
-  "check diff for replace a file"
-  if check_diff_output(diff_output,
-                       os.path.join('A', 'D', 'G', 'rho'),
-                       'D'):
-    return 1
-  if check_diff_output(diff_output,
-                       os.path.join('A', 'D', 'G', 'rho'),
-                       'A'):
-    return 1
-  return 0
+check_replace_a_file = diff_checker((rho_path, 'D'), (rho_path, 'A'))
     
 #----------------------------------------------------------------------
 
-def update_three_files():
+def update_three_files(wc_dir):
   "update three files"
-  svntest.main.file_append(os.path.join('A', 'D', 'gamma'), "new gamma")
-  svntest.main.file_append(os.path.join('A', 'D', 'G', 'tau'), "new tau")
-  svntest.main.file_append(os.path.join('A', 'D', 'H', 'psi'), "new psi")
+  svntest.main.file_append(os.path.join(wc_dir, gamma_path), "new gamma")
+  svntest.main.file_append(os.path.join(wc_dir, tau_path), "new tau")
+  svntest.main.file_append(os.path.join(wc_dir, psi_path), "new psi")
   return 0
 
-def check_update_three_files(diff_output):
-  "check update three files"
-  if check_diff_output(diff_output,
-                        os.path.join('A', 'D', 'gamma'),
-                        'M'):
-    return 1
-  if check_diff_output(diff_output,
-                        os.path.join('A', 'D', 'G', 'tau'),
-                        'M'):
-    return 1
-  if check_diff_output(diff_output,
-                        os.path.join('A', 'D', 'H', 'psi'),
-                        'M'):
-    return 1
-  return 0
+check_update_three_files = diff_checker((gamma_path, 'M'),
+                                        (tau_path, 'M'),
+                                        (psi_path, 'M'))
                         
 
 ######################################################################
 # make a change, check the diff, commit the change, check the diff
 
 def change_diff_commit_diff(wc_dir, revision, change_fn, check_fn):
-  "make a change, diff, commit, update and diff again"
+  "make a change, diff, commit and diff again"
 
-  was_cwd = os.getcwd()
-  os.chdir(wc_dir)
+  svntest.main.run_svn(None, 'up', '-rHEAD', cwd=wc_dir)
 
-  svntest.main.run_svn(None, 'up', '-rHEAD')
+  change_fn(wc_dir)
 
-  change_fn()
+  # Neither diff changes the working copy, so run them side by side.
+  # diff without revision doesn't use an editor, diff with revision
+  # runs an editor.
+  base_diff = svntest.main.start_svn('diff', cwd=wc_dir)
+  head_diff = svntest.main.start_svn('diff', '-rHEAD', cwd=wc_dir)
+  base_output = svntest.main.finish_svn(None, base_diff)[0]
+  head_output = svntest.main.finish_svn(None, head_diff)[0]
 
-  # diff without revision doesn't use an editor
-  diff_output, err_output = svntest.main.run_svn(None, 'diff')
-  if check_fn(diff_output):
-    os.chdir(was_cwd)
+  if check_fn(base_output):
     return 1
 
-  # diff with revision runs an editor
-  diff_output, err_output = svntest.main.run_svn(None, 'diff', '-rHEAD')
-  if check_fn(diff_output):
-    os.chdir(was_cwd)
+  if check_fn(head_output):
     return 1
 
-  svntest.main.run_svn(None, 'ci', '-m', '"log msg"')
-  svntest.main.run_svn(None, 'up')
-  diff_output, err_output = svntest.main.run_svn(None, 'diff', '-r', revision)
-  if check_fn(diff_output):
-    os.chdir(was_cwd)
+  # No 'svn up' after the commit: this working copy is the only one
+  # committing to the repository, so it already has every change.
+  svntest.main.run_svn(None, 'ci', '-m', '"log msg"', cwd=wc_dir)
+  if check_fn(diff_in_wc(wc_dir, '-r', revision)):
     return 1
 
-  os.chdir(was_cwd)
   return 0
 
 ######################################################################
@@ -307,15 +295,9 @@ def change_diff_commit_diff(wc_dir, revision, change_fn, check_fn):
 def just_diff(wc_dir, rev_check, check_fn):
   "update and check that the given diff is seen"
 
-  was_cwd = os.getcwd()
-  os.chdir(wc_dir)
-
-  diff_output, err_output = svntest.main.run_svn(None, 'diff', '-r', rev_check)
-  if check_fn(diff_output):
-    os.chdir(was_cwd)
+  if check_fn(diff_in_wc(wc_dir, '-r', rev_check)):
     return 1
 
-  os.chdir(was_cwd)
   return 0
 
 ######################################################################
@@ -324,11 +306,7 @@ def just_diff(wc_dir, rev_check, check_fn):
 def update_diff(wc_dir, rev_up, rev_check, check_fn):
   "update and check that the given diff is seen"
 
-  was_cwd = os.getcwd()
-  os.chdir(wc_dir)
-
-  svntest.main.run_svn(None, 'up', '-r', rev_up)
-  os.chdir(was_cwd)
+  svntest.main.run_svn(None, 'up', '-r', rev_up, cwd=wc_dir)
 
   return just_diff(wc_dir, rev_check, check_fn)
 
@@ -338,16 +316,9 @@ def update_diff(wc_dir, rev_up, rev_check, check_fn):
 def repo_diff(wc_dir, rev1, rev2, check_fn):
   "check that the given pure repository diff is seen"
 
-  was_cwd = os.getcwd()
-  os.chdir(wc_dir)
-
-  diff_output, err_output = svntest.main.run_svn(None, 'diff', '-r',
-                                                 `rev2` + ':' + `rev1`)
-  if check_fn(diff_output):
-    os.chdir(was_cwd)
+  if check_fn(diff_in_wc(wc_dir, '-r', `rev2` + ':' + `rev1`)):
     return 1
 
-  os.chdir(was_cwd)
   return 0
 
 ######################################################################
@@ -502,19 +473,14 @@ def diff_non_recursive(sbox):
 def diff_repo_subset(sbox):
   "diff only part of the repository"
 
-  if sbox.build():
+  if sbox.build(read_only = 1):
     return 1
 
   wc_dir = sbox.wc_dir
 
-  was_cwd = os.getcwd()
-  os.chdir(wc_dir)
-
-  update_a_file()
-  add_a_file()
-  add_a_file_in_a_subdir()
-
-  os.chdir(was_cwd)
+  update_a_file(wc_dir)
+  add_a_file(wc_dir)
+  add_a_file_in_a_subdir(wc_dir)
   
   if diff_check_update_a_file_repo_subset(wc_dir):
     return 1
@@ -532,7 +498,7 @@ def diff_repo_subset(sbox):
 def diff_non_version_controlled_file(sbox):
   "non version controlled files"
 
-  if sbox.build():
+  if sbox.build(read_only = 1):
     return 1
 
   wc_dir = sbox.wc_dir
@@ -561,57 +527,46 @@ def diff_pure_repository_update_a_file(sbox):
     return 1
 
   wc_dir = sbox.wc_dir
-  was_cwd = os.getcwd()
-  os.chdir(wc_dir)
 
   # rev 2
-  update_a_file()
-  svntest.main.run_svn(None, 'ci', '-m', '"log msg"')
+  update_a_file(wc_dir)
+  svntest.main.run_svn(None, 'ci', '-m', '"log msg"', cwd=wc_dir)
 
   # rev 3
-  add_a_file_in_a_subdir()
-  svntest.main.run_svn(None, 'ci', '-m', '"log msg"')
+  add_a_file_in_a_subdir(wc_dir)
+  svntest.main.run_svn(None, 'ci', '-m', '"log msg"', cwd=wc_dir)
 
   # rev 4
-  add_a_file()
-  svntest.main.run_svn(None, 'ci', '-m', '"log msg"')
+  add_a_file(wc_dir)
+  svntest.main.run_svn(None, 'ci', '-m', '"log msg"', cwd=wc_dir)
 
   # rev 5
-  update_added_file()
-  svntest.main.run_svn(None, 'ci', '-m', '"log msg"')
-
-  svntest.main.run_svn(None, 'up', '-r2')
-  os.chdir(was_cwd)
-
-  url = svntest.main.test_area_url + '/' + svntest.main.current_repo_dir
-
-  diff_output, err_output = svntest.main.run_svn(None, 'diff', '-r1:2', url)
-  if check_update_a_file(diff_output): return 1
-
-  os.chdir(wc_dir)
-  diff_output, err_output = svntest.main.run_svn(None, 'diff', '-r1:2')
-  os.chdir(was_cwd)
-  if check_update_a_file(diff_output): return 1
-
-  diff_output, err_output = svntest.main.run_svn(None, 'diff', '-r2:3', url)
-  if check_add_a_file_in_a_subdir(diff_output): return 1
-
-  os.chdir(wc_dir)
-  diff_output, err_output = svntest.main.run_svn(None, 'diff', '-r2:3')
-  os.chdir(was_cwd)
-  if check_add_a_file_in_a_subdir(diff_output): return 1
-
-  diff_output, err_output = svntest.main.run_svn(None, 'diff', '-r4:5', url)
-  if check_update_added_file(diff_output): return 1
-
-  os.chdir(wc_dir)
-  diff_output, err_output = svntest.main.run_svn(None, 'diff', '-r4:5')
-  os.chdir(was_cwd)
-  if check_update_added_file(diff_output): return 1
-
-  os.chdir(wc_dir)
-  diff_output, err_output = svntest.main.run_svn(None, 'diff', '-rhead')
-  os.chdir(was_cwd)
+  update_added_file(wc_dir)
+  svntest.main.run_svn(None, 'ci', '-m', '"log msg"', cwd=wc_dir)
+
+  svntest.main.run_svn(None, 'up', '-r2', cwd=wc_dir)
+
+  url = sbox.repo_url
+
+  # Each range is diffed both by URL and in the working copy.  None of
+  # these diffs changes anything, so start all six at once and check
+  # their output once they're done.
+  checks = [('-r1:2', check_update_a_file),
+            ('-r2:3', check_add_a_file_in_a_subdir),
+            ('-r4:5', check_update_added_file)]
+  diffs = []
+  for revs, check_fn in checks:
+    diffs.append((svntest.main.start_svn('diff', revs, url), check_fn))
+    diffs.append((svntest.main.start_svn('diff', revs, cwd=wc_dir),
+                  check_fn))
+  results = []
+  for svn, check_fn in diffs:
+    results.append((svntest.main.finish_svn(None, svn)[0], check_fn))
+
+  for diff_output, check_fn in results:
+    if check_fn(diff_output): return 1
+
+  diff_output = diff_in_wc(wc_dir, '-rhead')
   if check_add_a_file_in_a_subdir_reverse(diff_output): return 1
 
   return 0
@@ -625,22 +580,20 @@ def diff_only_property_change(sbox):
 
   wc_dir = sbox.wc_dir
 
-  current_dir = os.getcwd();
-  os.chdir(sbox.wc_dir);
-
-  svntest.main.run_svn(None, 'propset', 'svn:eol-style', 'none', "iota")
-  svntest.main.run_svn(None, 'ci', '-m', 'empty-msg')
+  svntest.main.run_svn(None, 'propset', 'svn:eol-style', 'none', "iota",
+                       cwd=wc_dir)
+  svntest.main.run_svn(None, 'ci', '-m', 'empty-msg', cwd=wc_dir)
 
-  result = 0
+  # svn reports any failure on stderr.
+  diff_output, err_output = svntest.main.run_svn(None, 'diff', '-r1:2',
+                                                 wc_dir)
+  if err_output: return 1
 
-  if os.system(svntest.main.svn_binary + " diff -r1:2"):
-    result = 1
+  diff_output, err_output = svntest.main.run_svn(None, 'diff', '-r2:1',
+                                                 wc_dir)
+  if err_output: return 1
 
-  if not result and os.system(svntest.main.svn_binary + " diff -r2:1"):
-    result = 1
-
-  os.chdir(current_dir)
-  return result
+  return 0
 
 
 
@@ -51,33 +51,32 @@ def load_expected_output(basename):
 
   return exp_stdout, exp_stderr
 
-# This is a list of lines to delete.
-del_lines_res = [ re.compile(r'\s+compiled\s+'),
-                  re.compile(r"- handles '(https|file)' schema"),
+# This is a list of lines to delete.  The patterns are applied to the
+# whole output at once, so each one matches an entire line.  A line
+# goes if it has "compiled" after whitespace and before more (or the
+# end of the line), or the https/file line, not counting its first
+# character either way.
+del_lines_res = [ re.compile(r'^.+[^\S\n]compiled(?:[^\S\n].*\n?|\n)', re.M),
+                  re.compile(r"^.+- handles '(https|file)' schema.*\n?", re.M),
                 ]
 
 # This is a list of lines to search and replace text on.
 rep_lines_res = [ (re.compile(r'version \d+\.\d+\.\d+ '), 'version X.Y.Z '),
                 ]
 
-def process_lines(lines):
-  "delete lines that should not be compared and search and replace the rest"
-  output = [ ]
-  for line in lines:
-    # Skip these lines from the output list.
-    delete_line = 0
-    for delete_re in del_lines_res:
-      if delete_re.search(line, 1):
-        delete_line = 1
-        break
-    if delete_line:
-      continue
-
-    # Search and replace text on the rest.
-    for replace_re, replace_str in rep_lines_res:
-      line = replace_re.sub(replace_str, line)
-
-    output.append(line)
+def process_output(lines):
+  """delete lines that should not be compared and search and replace the
+  rest; return the result as a single string"""
+
+  # A few substitutions over the joined output beat a loop of regex
+  # searches per line, and the result compares with a single '!='.
+  output = string.join(lines, '')
+
+  for delete_re in del_lines_res:
+    output = delete_re.sub('', output)
+
+  for replace_re, replace_str in rep_lines_res:
+    output = replace_re.sub(replace_str, output)
 
   return output
 
@@ -94,10 +93,10 @@ def run_one_test(sbox, basename, *varargs):
   # Delete and perform search and replaces on the lines from the
   # actual and expected output that may differ between build
   # environments.
-  exp_stdout    = process_lines(exp_stdout)
-  exp_stderr    = process_lines(exp_stderr)
-  actual_stdout = process_lines(actual_stdout)
-  actual_stderr = process_lines(actual_stderr)
+  exp_stdout    = process_output(exp_stdout)
+  exp_stderr    = process_output(exp_stderr)
+  actual_stdout = process_output(actual_stdout)
+  actual_stderr = process_output(actual_stderr)
 
   if exp_stdout != actual_stdout:
     print "Standard output does not match."
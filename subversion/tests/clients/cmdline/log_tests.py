@@ -175,6 +175,10 @@ class SVNLogParseError(Exception):
   def __init__ (self, args=None):
     self.args = args
 
+# Regular expression to match the header line of a log message, with
+# these groups: (revision number), (author), (date), (num lines).
+header_re = re.compile ('^rev ([0-9]+):  ' \
+                        + '([^|]*) \| ([^|]*) \| ([0-9]+) lines?')
 
 def parse_log_output(log_lines):
   """Return a log chain derived from LOG_LINES.
@@ -221,11 +225,6 @@ def parse_log_output(log_lines):
   # Log message for revision 1.
   # ------------------------------------------------------------------------
 
-  # Regular expression to match the header line of a log message, with
-  # these groups: (revision number), (author), (date), (num lines).
-  header_re = re.compile ('^rev ([0-9]+):  ' \
-                          + '([^|]*) \| ([^|]*) \| ([0-9]+) lines?')
-
   # The log chain to return.
   chain = []
 
@@ -266,6 +265,9 @@ def parse_log_output(log_lines):
 
   return chain
 
+# What the author and date of a log item should at least look like.
+author_re = re.compile ('[a-zA-Z]+')
+date_re = re.compile ('[0-9]+')
 
 def check_log_chain (chain, start, end):
   """Verify that log chain CHAIN contains the right log messages for
@@ -298,8 +300,6 @@ def check_log_chain (chain, start, end):
     # The most important check is that the revision is right:
     if expect_rev != saw_rev: return 1
     # Check that author and date look at least vaguely right:
-    author_re = re.compile ('[a-zA-Z]+')
-    date_re = re.compile ('[0-9]+')
     if (not author_re.search (author)): return 1
     if (not date_re.search (date)): return 1
     # Check that the log message looks right:
@@ -328,11 +328,9 @@ def revert_add_files(sbox):
   if len(errput) > 0:
     print errput
     return 1
-  if len (expected_output) != len (output): return 1
   output.sort()
   expected_output.sort()
-  for index in range (len (output)):
-    if output[index] != expected_output[index]: return 1
+  if output != expected_output: return 1
 
   return 0
 
@@ -359,11 +357,9 @@ def revert_add_directories(sbox):
   if len(errput) > 0:
     print errput
     return 1
-  if len (expected_output) != len (output): return 1
   output.sort()
   expected_output.sort()
-  for index in range (len (output)):
-    if output[index] != expected_output[index]: return 1
+  if output != expected_output: return 1
 
   return 0
 
@@ -390,11 +386,9 @@ def revert_nested_adds(sbox):
   if len(errput) > 0:
     print errput
     return 1
-  if len (expected_output) != len (output): return 1
   output.sort()
   expected_output.sort()
-  for index in range (len (output)):
-    if output[index] != expected_output[index]: return 1
+  if output != expected_output: return 1
 
   return 0
 
@@ -423,11 +417,9 @@ def revert_delete_files(sbox):
   if len(errput) > 0:
     print errput
     return 1
-  if len (expected_output) != len (output): return 1
   output.sort()
   expected_output.sort()
-  for index in range (len (output)):
-    if output[index] != expected_output[index]: return 1
+  if output != expected_output: return 1
 
   return 0
 
@@ -464,11 +456,9 @@ def revert_delete_dirs(sbox):
   if len(errput) > 0:
     print errput
     return 1
-  if len (expected_output) != len (output): return 1
   output.sort()
   expected_output.sort()
-  for index in range (len (output)):
-    if output[index] != expected_output[index]: return 1
+  if output != expected_output: return 1
 
   return 0
 
@@ -80,8 +80,7 @@ def status_update_with_nested_adds(sbox):
   svntest.main.file_append (newfile_path, 'new text')
 
   # Schedule newdir and newfile for addition
-  svntest.main.run_svn(None, 'add', newdir_path)
-  svntest.main.run_svn(None, 'add', newfile_path)
+  svntest.main.run_svn(None, 'add', newdir_path, newfile_path)
 
   # Created expected output tree for commit
   output_list = [ [newdir_path, None, {}, {'verb' : 'Adding' }],
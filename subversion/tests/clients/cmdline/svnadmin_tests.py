@@ -59,6 +59,8 @@ path_index = svntest.actions.path_index
 ######################################################################
 # Helper routines
 
+# The header of each revision in 'svnadmin lsrevs' output.
+revision_re = re.compile("^Revision\s+(.+)")
 
 def get_revs(repo_dir):
   "Get a list of revisions in the repository, using 'svnadmin lsrevs'."
@@ -66,10 +68,9 @@ def get_revs(repo_dir):
   revs = []
 
   output_lines, errput_lines = svntest.main.run_svnadmin("lsrevs", repo_dir)
-  rm = re.compile("^Revision\s+(.+)")
 
   for line in output_lines:
-    match = rm.search(line)
+    match = revision_re.search(line)
     if match:
       revs.append(match.group(1))
 
@@ -20,6 +20,10 @@ import os.path, shutil, string, re, sys
 
 import main, tree  # general svntest routines in this module.
 
+# The last lines of successful 'svn import' and 'svn ci' output.
+committed_re = re.compile("(Committed|Imported) revision [0-9]+.")
+transmitting_re = re.compile("Transmitting file data.+")
+
 
 ######################################################################
 # Used by every test, so that they can run independently of
@@ -28,13 +32,11 @@ import main, tree  # general svntest routines in this module.
 # Thereafter, every time this routine is called, it recursively copies
 # the `pristine repos' to a new location.
 
-def guarantee_greek_repository(path):
-  """Guarantee that a local svn repository exists at PATH, containing
-  nothing but the greek-tree at revision 1."""
-
-  if path == main.pristine_dir:
-    print "ERROR:  attempt to overwrite the pristine repos!  Aborting."
-    sys.exit(1)
+def guarantee_pristine_repository():
+  """Guarantee that the pristine repository exists, containing nothing
+  but the greek-tree at revision 1.  Tests running in parallel must
+  not race to create it, so the test driver calls this once before
+  starting them."""
 
   # If there's no pristine repos, create one.
   if not os.path.exists(main.pristine_dir):
@@ -64,8 +66,7 @@ def guarantee_greek_repository(path):
 
     # verify the printed output of 'svn import'.
     lastline = string.strip(output.pop())
-    cm = re.compile ("(Committed|Imported) revision [0-9]+.")
-    match = cm.search (lastline)
+    match = committed_re.search (lastline)
     if not match:
       print "ERROR:  import did not succeed, while creating greek repos."
       print "The final line from 'svn import' was:"
@@ -84,15 +85,34 @@ def guarantee_greek_repository(path):
       print "ERROR:  output of import command is unexpected."
       sys.exit(1)
 
+
+def guarantee_greek_repository(path):
+  """Guarantee that a local svn repository exists at PATH, containing
+  nothing but the greek-tree at revision 1."""
+
+  if path == main.pristine_dir:
+    print "ERROR:  attempt to overwrite the pristine repos!  Aborting."
+    sys.exit(1)
+
+  guarantee_pristine_repository()
+
   # Now that the pristine repos exists, copy it to PATH.
   if os.path.exists(path):
     shutil.rmtree(path)
   if not os.path.exists(os.path.dirname(path)):
     os.makedirs(os.path.dirname(path))
-  shutil.copytree(main.pristine_dir, path)
-  if os.path.exists(main.current_repo_dir):
-    os.unlink(main.current_repo_dir)                              
-  os.symlink(os.path.basename(path), main.current_repo_dir)
+  main.copy_tree(main.pristine_dir, path)
+
+  # Other RA layers than ra_local reach the repository through the
+  # 'current-repo' link.  ra_local tests use their own repository's
+  # path, and under '--parallel' may race each other over the link.
+  try:
+    if os.path.islink(main.current_repo_dir):
+      os.unlink(main.current_repo_dir)
+    os.symlink(os.path.basename(path), main.current_repo_dir)
+  except os.error:
+    if not main.using_ra_local():
+      raise
   
 
 ######################################################################
@@ -235,8 +255,7 @@ def run_and_verify_commit(wc_dir_name, output_tree, status_output_tree,
   if len(output):
     lastline = string.strip(output.pop())
     
-    cm = re.compile("(Committed|Imported) revision [0-9]+.")
-    match = cm.search(lastline)
+    match = committed_re.search(lastline)
     if not match:
       print "ERROR:  commit did not succeed."
       print "The final line from 'svn ci' was:"
@@ -251,8 +270,7 @@ def run_and_verify_commit(wc_dir_name, output_tree, status_output_tree,
   if len(output):
     lastline = output.pop()
 
-    tm = re.compile("Transmitting file data.+")
-    match = tm.search(lastline)
+    match = transmitting_re.search(lastline)
     if not match:
       # whoops, it was important output, put it back.
       output.append(lastline)
@@ -336,6 +354,103 @@ def run_and_verify_unquiet_status(wc_dir_name, output_tree,
 # Other general utilities
 
 
+# Check out the greek tree from URL into WC_DIR, verifying the output
+# and the resulting disk contents.
+def checkout_greek_tree(url, wc_dir):
+  "Checkout the greek tree at URL into WC_DIR.  Return 0 if successful."
+
+  # Generate the expected output tree.
+  output_list = []
+  path_list = [x[0] for x in main.greek_tree]
+  for path in path_list:
+    item = [ os.path.join(wc_dir, path), None, {}, {'status' : 'A '} ]
+    output_list.append(item)
+  expected_output_tree = tree.build_generic_tree(output_list)
+
+  # Generate an expected wc tree.
+  expected_wc_tree = tree.build_generic_tree(main.greek_tree)
+
+  # Do a checkout, and verify the resulting output and disk contents.
+  return run_and_verify_checkout(url, wc_dir,
+                                 expected_output_tree,
+                                 expected_wc_tree)
+
+
+# Only ra_local working copies can be copied from the pristine one:
+# other RA layers cache repository paths in the admin area.
+def pristine_wc_usable():
+  "Return true if working copies may be copied from the pristine one."
+
+  return main.using_ra_local()
+
+
+def guarantee_pristine_wc():
+  """Guarantee that a checkout of the pristine repository exists at
+  main.pristine_wc_dir.  Return 0 on success, non-zero on failure."""
+
+  guarantee_pristine_repository()
+
+  if os.path.exists(main.pristine_wc_dir):
+    return 0
+
+  url = main.test_area_url + '/' + main.pristine_dir
+  if checkout_greek_tree(url, main.pristine_wc_dir):
+    main.remove_wc(main.pristine_wc_dir)
+    return 1
+
+  return 0
+
+
+def guarantee_shared_repository():
+  """Guarantee that main.shared_repo_dir exists, a copy of the pristine
+  repository for the read-only tests to share."""
+
+  if not os.path.exists(main.shared_repo_dir):
+    guarantee_pristine_repository()
+    main.copy_tree(main.pristine_dir, main.shared_repo_dir)
+
+
+def xml_escape(text):
+  "Return TEXT escaped the way the entries file writer escapes it."
+
+  # '&' goes first, so as not to re-escape the others.
+  for char, entity in (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'),
+                       ('"', '&quot;'), ("'", '&apos;')):
+    text = string.replace(text, char, entity)
+  return text
+
+def relocate_wc(wc_dir, from_url, to_url):
+  """Rewrite the entries files in WC_DIR so that every URL beginning
+  with FROM_URL begins with TO_URL instead.  Return 0 on success,
+  non-zero if some entries file didn't mention FROM_URL at all."""
+
+  entries_path = os.path.join(wc_dir, main.get_admin_name(), 'entries')
+  fp = open(entries_path, 'r')
+  entries = fp.read()
+  fp.close()
+
+  # The URLs are stored as XML attribute values.  This catches
+  # 'copyfrom-url' attributes, too.
+  from_att = 'url="' + xml_escape(from_url)
+  if string.find(entries, from_att) == -1:
+    print "ERROR:  no", from_url, "in", entries_path
+    return 1
+  entries = string.replace(entries, from_att, 'url="' + xml_escape(to_url))
+
+  fp = open(entries_path, 'w')
+  fp.write(entries)
+  fp.close()
+
+  for name in os.listdir(wc_dir):
+    path = os.path.join(wc_dir, name)
+    if (name != main.get_admin_name()
+        and os.path.isdir(os.path.join(path, main.get_admin_name()))):
+      if relocate_wc(path, from_url, to_url):
+        return 1
+
+  return 0
+
+
 # This allows a test to *quickly* bootstrap itself.
 def make_repo_and_wc(test_name):
   """Create a fresh repository and checkout a wc from it.
@@ -352,24 +467,38 @@ def make_repo_and_wc(test_name):
   # Create (or copy afresh) a new repos with a greek tree in it.
   guarantee_greek_repository(repo_dir)
 
-  # make url for checkout
-  url = main.test_area_url + '/' + main.current_repo_dir
+  # make url for checkout.  Over ra_local, use the test's own
+  # repository rather than 'current-repo', which another test running
+  # in parallel may have re-pointed by now.
+  url = main.get_repo_url(repo_dir)
 
-  # Generate the expected output tree.
-  output_list = []
-  path_list = [x[0] for x in main.greek_tree]
-  for path in path_list:
-    item = [ os.path.join(wc_dir, path), None, {}, {'status' : 'A '} ]
-    output_list.append(item)
-  expected_output_tree = tree.build_generic_tree(output_list)
+  return make_greek_wc(url, wc_dir)
 
-  # Generate an expected wc tree.
-  expected_wc_tree = tree.build_generic_tree(main.greek_tree)
 
-  # Do a checkout, and verify the resulting output and disk contents.
-  return run_and_verify_checkout(url, wc_dir,
-                                 expected_output_tree,
-                                 expected_wc_tree)
+def make_greek_wc(url, wc_dir):
+  """Create a working copy of the greek tree at URL in WC_DIR.
+  Return 0 on success, non-zero on failure."""
+
+  if not pristine_wc_usable():
+    return checkout_greek_tree(url, wc_dir)
+
+  # Every fresh checkout is identical, so check out (and verify) just
+  # once, then copy that working copy and point it at URL.
+  if guarantee_pristine_wc():
+    return 1
+
+  main.remove_wc(wc_dir)
+  if not os.path.exists(os.path.dirname(wc_dir)):
+    os.makedirs(os.path.dirname(wc_dir))
+  main.copy_tree(main.pristine_wc_dir, wc_dir)
+
+  pristine_url = main.test_area_url + '/' + main.pristine_dir
+  if url != pristine_url:
+    # A copy still pointing at the pristine repository would commit
+    # into it, breaking every test after this one.
+    return relocate_wc(wc_dir, pristine_url, url)
+
+  return 0
 
 
 # Duplicate a working copy or other dir.
@@ -379,7 +508,7 @@ def duplicate_dir(wc_name, wc_copy_name):
 
   if os.path.exists(wc_copy_name):
     shutil.rmtree(wc_copy_name)
-  shutil.copytree(wc_name, wc_copy_name)
+  main.copy_tree(wc_name, wc_copy_name)
   
 
 
@@ -17,7 +17,7 @@
 ######################################################################
 
 import sys     # for argv[]
-import os      # for popen2()
+import os      # for popen3()
 import shutil  # for rmtree()
 import re      # to parse version string
 import string  # for atof()
@@ -62,6 +62,8 @@ class SVNTreeIsNotDirectory(Exception): pass
 
 # The locations of the svn, svnadmin and svnlook binaries, relative to
 # the only scripts that import this file right now (they live in ../).
+# These are resolved to absolute paths once, here, and run_command()
+# execs them directly, so there's no PATH search per command.
 svn_binary = os.path.abspath('../../../clients/cmdline/svn')
 svnadmin_binary = os.path.abspath('../../../svnadmin/svnadmin')
 svnlook_binary = os.path.abspath('../../../svnlook/svnlook')
@@ -86,10 +88,15 @@ temp_dir = 'local_tmp'
 # (derivatives of the tmp dir.)
 pristine_dir = os.path.join(temp_dir, "repos")
 greek_dump_dir = os.path.join(temp_dir, "greekfiles")
+pristine_wc_dir = os.path.join(temp_dir, "wc")
+shared_repo_dir = os.path.join(temp_dir, "shared-repos")
 
 # Global URL to testing area.  Default to ra_local, current working dir.
 test_area_url = "file://" + os.path.abspath(os.getcwd())
 
+# How many tests may run at once.  Set by the '--parallel' argument.
+parallel_jobs = 1
+
 
 # Our pristine greek-tree list of lists.
 #
@@ -135,6 +142,20 @@ def get_admin_name():
   # the admin dir is.  For now, '.svn' will suffice.
   return '.svn'
 
+def using_ra_local():
+  "Return true if the tests reach their repositories through ra_local."
+
+  return test_area_url[:7] == 'file://'
+
+def get_repo_url(repo_dir):
+  """Return the URL of the repository REPO_DIR.  Other RA layers than
+  ra_local can see just the 'current-repo' link (see README), which
+  guarantee_greek_repository() points at the newest repository."""
+
+  if using_ra_local():
+    return test_area_url + '/' + repo_dir
+  return test_area_url + '/' + current_repo_dir
+
 def get_start_commit_hook_path(repo_dir):
   "Return the path of the start-commit-hook conf file in REPO_DIR."
 
@@ -154,17 +175,93 @@ def get_post_commit_hook_path(repo_dir):
 
 
 
-# For running subversion and returning the output
-def run_svn(error_expected, *varargs):
-  """Run svn with VARARGS; return stdout, stderr as lists of lines.
- 
-     If ERROR_EXPECTED is None, any stderr also will be printed. """
+# For running a command without going through the shell
+class ChildProcess:
+  """Run CMD (a list, CMD[0] an absolute path) in a child process, in
+  directory CWD if given.  The child's stdout and stderr can be read
+  from the FROMCHILD and CHILDERR files; its stdin is /dev/null.
+
+  This is popen2.Popen3 minus the loop that close()s every fd up to
+  SC_OPEN_MAX before the exec, one system call each: under a large
+  'ulimit -n' that loop costs more than running svn.  The child closes
+  just the pipes made here, and inherits the rest of the harness's
+  (harmless) descriptors."""
 
-  command = svn_binary
-  for arg in varargs:
-    command = command + " " + `arg`    # build the command string
+  def __init__(self, cmd, cwd=None):
+    out_read, out_write = os.pipe()
+    err_read, err_write = os.pipe()
 
+    self.pid = os.fork()
+    if self.pid == 0:
+      # Only the child changes directory, never the test process.  No
+      # exception may escape here and let the child carry on as a
+      # test run.
+      try:
+        try:
+          null = os.open('/dev/null', os.O_RDONLY)
+          os.dup2(null, 0)
+          os.dup2(out_write, 1)
+          os.dup2(err_write, 2)
+          for fd in (null, out_read, out_write, err_read, err_write):
+            if fd > 2:
+              os.close(fd)
+          if cwd is not None:
+            os.chdir(cwd)
+          os.execv(cmd[0], cmd)
+        except:
+          # Say why on the child's stderr, as the shell would have:
+          # a missing binary mustn't look like empty output.
+          os.write(2, cmd[0] + ': ' + str(sys.exc_info()[1]) + '\n')
+      finally:
+        os._exit(1)
+
+    os.close(out_write)
+    os.close(err_write)
+    self.fromchild = os.fdopen(out_read, 'r')
+    self.childerr = os.fdopen(err_read, 'r')
+
+  def wait(self):
+    "Wait for the child to exit and return its exit status."
+    pid, status = os.waitpid(self.pid, 0)
+    return status
+
+  def finish(self):
+    "Wait for the child to exit; return its stdout, stderr as lists of lines."
+    stdout_lines = self.fromchild.readlines()
+    stderr_lines = self.childerr.readlines()
+    self.fromchild.close()
+    self.childerr.close()
+    self.wait()
+    return stdout_lines, stderr_lines
+
+class FinishedProcess:
+  "Stands in for a ChildProcess whose output was collected already."
+
+  def __init__(self, stdout_lines, stderr_lines):
+    self.output = stdout_lines, stderr_lines
+
+  def finish(self):
+    return self.output
+
+# For running one of our binaries and returning the output
+def run_command(binary, varargs, cwd=None):
+  """Run BINARY (an absolute path) with VARARGS; return stdout, stderr
+  as lists of lines.  If CWD is given, run BINARY in that directory."""
+
+  if hasattr(os, 'fork'):
+    # Exec BINARY directly.  Going through the shell costs a second
+    # exec per command, and the arguments would need quoting.
+    return ChildProcess([binary] + map(str, varargs), cwd).finish()
+
+  # No fork() here, so let the shell do it; quote each arg with repr().
+  command = string.join([binary] + map(repr, varargs))
+
+  if cwd is not None:
+    was_cwd = os.getcwd()
+    os.chdir(cwd)
   infile, outfile, errfile = os.popen3(command)
+  if cwd is not None:
+    os.chdir(was_cwd)
   stdout_lines = outfile.readlines()
   stderr_lines = errfile.readlines()
 
@@ -172,6 +269,41 @@ def run_svn(error_expected, *varargs):
   infile.close()
   errfile.close()
 
+  return stdout_lines, stderr_lines
+
+# For running subversion and returning the output
+def run_svn(error_expected, *varargs, **kw):
+  """Run svn with VARARGS; return stdout, stderr as lists of lines.
+ 
+     If ERROR_EXPECTED is None, any stderr also will be printed.
+     If the keyword argument CWD is given, svn runs in that directory
+     (the caller's own working directory is left alone). """
+
+  return finish_svn(error_expected, apply(start_svn, varargs, kw))
+
+# For running svn while the test gets on with something else
+def start_svn(*varargs, **kw):
+  """Start svn with VARARGS (and optional keyword CWD, as for run_svn)
+  and return without waiting for it to exit.  Pass the result to
+  finish_svn() to collect the output; every started svn must be
+  finished.  Without fork(), svn runs to completion right here."""
+
+  # Catch a misspelt 'cwd', which would run svn in the wrong place.
+  for key in kw.keys():
+    if key != 'cwd':
+      raise TypeError, "unexpected keyword argument '" + key + "'"
+
+  if hasattr(os, 'fork'):
+    return ChildProcess([svn_binary] + map(str, varargs), kw.get('cwd'))
+  return apply(FinishedProcess, run_command(svn_binary, varargs,
+                                            kw.get('cwd')))
+
+def finish_svn(error_expected, svn):
+  """Wait for SVN, as returned by start_svn(), to exit; return stdout,
+  stderr as lists of lines.  ERROR_EXPECTED is as for run_svn."""
+
+  stdout_lines, stderr_lines = svn.finish()
+
   if (not error_expected) and (stderr_lines):
     print stderr_lines
 
@@ -181,19 +313,7 @@ def run_svn(error_expected, *varargs):
 def run_svnadmin(*varargs):
   "Run svnadmin with VARARGS, returns stdout, stderr as list of lines."
 
-  command = svnadmin_binary
-  for arg in varargs:
-    command = command + " " + `arg`    # build the command string
-
-  infile, outfile, errfile = os.popen3(command)
-  stdout_lines = outfile.readlines()
-  stderr_lines = errfile.readlines()
-
-  outfile.close()
-  infile.close()
-  errfile.close()
-
-  return stdout_lines, stderr_lines
+  return run_command(svnadmin_binary, varargs)
 
 
 # For clearing away working copies
@@ -203,6 +323,36 @@ def remove_wc(dirname):
   if os.path.exists(dirname):
     shutil.rmtree(dirname)
 
+# Whether copy_tree() should try 'cp --reflink=auto' first.  Cleared
+# if cp turns down the option (it's not GNU cp, most likely).
+cp_binary = '/bin/cp'
+use_cp_reflink = hasattr(os, 'fork') and os.path.exists(cp_binary)
+
+# For copying repositories and working copies
+def copy_tree(src, dst):
+  """Recursively copy the directory SRC to DST, which must not exist.
+  Where the filesystem can, the files are copy-on-write clones."""
+
+  global use_cp_reflink
+
+  if use_cp_reflink:
+    cp = ChildProcess([cp_binary, '-pR', '--reflink=auto', src, dst])
+    cp.fromchild.close()
+    errors = cp.childerr.read()
+    cp.childerr.close()
+    if not cp.wait():
+      return
+    if (string.find(errors, 'reflink') != -1
+        or string.find(errors, 'option') != -1):
+      use_cp_reflink = 0
+    else:
+      print "cp of", src, "failed, copying it by hand:"
+      print errors,
+    if os.path.exists(dst):
+      shutil.rmtree(dst)
+
+  shutil.copytree(src, dst)
+
 # For making local mods to files
 def file_append(path, new_text):
   "Append NEW_TEXT to file at PATH"
@@ -265,10 +415,50 @@ class Sandbox:
     self.name = '%s-%d' % (module, idx)
     self.wc_dir = os.path.join(general_wc_dir, self.name)
     self.repo_dir = os.path.join(general_repo_dir, self.name)
+    self.repo_url = get_repo_url(self.repo_dir)
+    self.shares_repos = 0
+
+  def build(self, read_only = 0):
+    """Make a greek-tree repository and working copy for the test.
+    Return 0 on success, non-zero on failure.
+
+    A test that commits nothing may pass READ_ONLY; its working copy
+    then comes from a repository shared by every such test in the run,
+    which saves copying a repository of its own.  That repository is
+    a copy of the pristine one, never the pristine one itself: even a
+    diff against the repository uses up a transaction, and the other
+    sandboxes must start from a fresh import.  (Only ra_local can do
+    this; other RA layers can't see the shared repository, so they get
+    a private copy regardless.  Nor is it done under '--parallel',
+    where several tests would have the shared repository open.)"""
+
+    if read_only and using_ra_local() and parallel_jobs == 1:
+      actions.guarantee_shared_repository()
+      self.repo_dir = shared_repo_dir
+      self.repo_url = get_repo_url(shared_repo_dir)
+      self.shares_repos = 1
+      return actions.make_greek_wc(self.repo_url, self.wc_dir)
 
-  def build(self):
     return actions.make_repo_and_wc(self.name)
 
+  def verify_shared_repos(self):
+    """If the test used the shared read-only repository, make sure it
+    left it at revision 1.  If not, complain, throw that repository
+    away (it gets copied afresh when next needed) and return non-zero;
+    else return 0."""
+
+    if not self.shares_repos:
+      return 0
+
+    output, errput = run_svnadmin('youngest', shared_repo_dir)
+    if output == ['1\n']:
+      return 0
+
+    print "ERROR:  test", self.name, "claims to be read-only, but it"
+    print "committed to the shared repository:", output, errput
+    shutil.rmtree(shared_repo_dir)
+    return 1
+
 
 ######################################################################
 # Main testing functions
@@ -303,6 +493,8 @@ def run_one_test(n, test_list):
   except SVNTreeUnequal:
     print "caught an SVNTreeUnequal exception, returning error instead"
     error = 1
+  if args and sandbox.verify_shared_repos():
+    error = 1
   if error:
     print "FAIL:",
   else:
@@ -310,10 +502,73 @@ def run_one_test(n, test_list):
   print os.path.basename(sys.argv[0]), str(n) + ":", test_list[n].__doc__
   return error
 
+def _run_tests_in_parallel(test_list, jobs):
+  """Run every test in TEST_LIST, at most JOBS of them at a time, each
+  in a forked child.  Return non-zero if any of them failed.  Only for
+  ra_local, where each test reaches its own repository directly."""
+
+  # Every sandbox copies the pristine repository (and working copy);
+  # build them just once, up front, so the children don't race.
+  if actions.pristine_wc_usable():
+    if actions.guarantee_pristine_wc():
+      return 1
+  else:
+    actions.guarantee_pristine_repository()
+  # The sandboxes all go in these, and children making them at once
+  # would trip over each other's os.makedirs().
+  for dirname in (general_repo_dir, general_wc_dir):
+    if not os.path.exists(dirname):
+      os.makedirs(dirname)
+  sys.stdout.flush()
+
+  exit_code = 0
+  running = 0
+  for n in range(1, len(test_list)):
+    if running == jobs:
+      pid, status = os.wait()
+      running = running - 1
+      if status:
+        exit_code = 1
+
+    pid = os.fork()
+    if pid == 0:
+      # Each sandbox has its own repository and working copy, and the
+      # child's cwd is its own, so tests don't trip over each other.
+      try:
+        error = run_one_test(n, test_list)
+      except:
+        # Never let the child fall back into the parent's loop.  Only
+        # a crashing test needs traceback, so don't load it otherwise.
+        import traceback
+        traceback.print_exc()
+        error = 1
+      sys.stdout.flush()
+      sys.stderr.flush()
+      os._exit(error and 1 or 0)
+    running = running + 1
+
+  while running:
+    pid, status = os.wait()
+    running = running - 1
+    if status:
+      exit_code = 1
+
+  return exit_code
+
 def _internal_run_tests(test_list, testnum=None):
   exit_code = 0
 
-  if testnum is None:
+  if testnum is None and parallel_jobs > 1 and hasattr(os, 'fork'):
+    if using_ra_local():
+      exit_code = _run_tests_in_parallel(test_list, parallel_jobs)
+    else:
+      # Every test would want 'current-repo' pointing at its own
+      # repository at once.
+      print "'--parallel' needs a file:// URL; running tests one at a time."
+      for n in range(1, len(test_list)):
+        if run_one_test(n, test_list):
+          exit_code = 1
+  elif testnum is None:
     for n in range(1, len(test_list)):
       if run_one_test(n, test_list):
         exit_code = 1
@@ -331,6 +586,8 @@ def _internal_run_tests(test_list, testnum=None):
 #   1.  No command-line arguments: all tests in TEST_LIST are run.
 #   2.  Number 'N' passed on command-line: only test N is run
 #   3.  String "list" passed on command-line:  print each test's docstring.
+#
+# Passing "--parallel N" runs up to N tests at once (mode 1 only).
 
 def run_tests(test_list):
   """Main routine to run all tests in TEST_LIST.
@@ -340,9 +597,12 @@ def run_tests(test_list):
   """
 
   global test_area_url
+  global parallel_jobs
   testnum = None
 
-  for arg in sys.argv:
+  args = sys.argv[1:]
+  while args:
+    arg = args.pop(0)
 
     if arg == "list":
       print "Test #     Test Description"
@@ -356,8 +616,10 @@ def run_tests(test_list):
       sys.exit(0)
 
     elif arg == "--url":
-      index = sys.argv.index(arg)
-      test_area_url = sys.argv[index + 1]
+      test_area_url = args.pop(0)
+
+    elif arg == "--parallel":
+      parallel_jobs = int(args.pop(0))
 
     else:
       try:
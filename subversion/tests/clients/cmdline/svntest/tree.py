@@ -427,31 +427,35 @@ def compare_trees(a, b,
       raise main.SVNTypeMismatch
     # They're both directories.
     else:
-      accounted_for = []
+      # Index B's children by name, so that matching up the children
+      # is a hash lookup apiece rather than a scan of B's list (which
+      # made big directories, like a status of the whole greek tree,
+      # quadratic).
+      b_children = {}
+      for b_child in b.children:
+        b_children[b_child.name] = b_child
+      accounted_for = {}
       # For each child of A, check and see if it's in B.  If so, run
       # compare_trees on the two children and add b's child to
       # accounted_for.  If not, run FUNC_A on the child.  Next, for each
       # child of B, check and and see if it's in accounted_for.  If it
       # is, do nothing. If not, run FUNC_B on it.
       for a_child in a.children:
-        b_child = get_child(b, a_child.name)
+        b_child = b_children.get(a_child.name)
         if b_child:
-          accounted_for.append(b_child)
+          accounted_for[b_child.name] = 1
           compare_trees(a_child, b_child,
                         singleton_handler_a, a_baton,
                         singleton_handler_b, b_baton)
         else:
           singleton_handler_a(a_child, a_baton)
       for b_child in b.children:
-        if (b_child not in accounted_for):
+        if not accounted_for.has_key(b_child.name):
           singleton_handler_b(b_child, b_baton)
       return 0
   except main.SVNTypeMismatch:
     print 'Unequal Types: one Node is a file, the other is a directory'
     raise main.SVNTreeUnequal
-  except main.SVNTreeIsNotDirectory:
-    print "Error: Foolish call to get_child."
-    sys.exit(1)
   except IndexError:
     print "Error: unequal number of children"
     raise main.SVNTreeUnequal
@@ -526,6 +530,14 @@ def build_generic_tree(nodelist):
 ####################################################################
 # Build trees from different kinds of subcommand output.
 
+# The parsers run on every co/up/ci/st a test verifies; compile their
+# patterns just once.
+checkout_line_re = re.compile ('^(..)\s+(.+)')
+commit_line_re = re.compile ('^(\w+)\s+(.+)')
+commit_transmitting_re = re.compile ('^Transmitting')
+status_rev_re = re.compile ('^.+\:.+(\d+)')
+status_line_re = re.compile ('^(..)(.)(.)   .   [^0-9]+(\d+|-)(.{23})(.+)')
+
 
 # Parse co/up output into a tree.
 #
@@ -535,10 +547,9 @@ def build_tree_from_checkout(lines):
   "Return a tree derived by parsing the output LINES from 'co' or 'up'."
   
   root = SVNTreeNode(root_node_name)
-  rm = re.compile ('^(..)\s+(.+)')
   
   for line in lines:
-    match = rm.search(line)
+    match = checkout_line_re.search(line)
     if match and match.groups():
       new_branch = create_from_path(match.group(2), None, {},
                                     {'status' : match.group(1)})
@@ -556,13 +567,11 @@ def build_tree_from_commit(lines):
 
   # Lines typically have a verb followed by whitespace then a path.
   root = SVNTreeNode(root_node_name)
-  rm1 = re.compile ('^(\w+)\s+(.+)')
-  rm2 = re.compile ('^Transmitting')
   
   for line in lines:
-    match = rm2.search(line)
+    match = commit_transmitting_re.search(line)
     if not match:
-      match = rm1.search(line)
+      match = commit_line_re.search(line)
       if match and match.groups():
         new_branch = create_from_path(match.group(2), None, {},
                                       {'verb' : match.group(1)})
@@ -583,17 +592,15 @@ def build_tree_from_status(lines):
   "Return a tree derived by parsing the output LINES from 'st'."
 
   root = SVNTreeNode(root_node_name)
-  rm = re.compile ('^.+\:.+(\d+)')
   lastline = string.strip(lines.pop())
-  match = rm.search(lastline)
+  match = status_rev_re.search(lastline)
   if match and match.groups():
     repos_rev = match.group(1)
   else:
     repos_rev = '?'
     
-  rm = re.compile ('^(..)(.)(.)   .   [^0-9]+(\d+|-)(.{23})(.+)')
   for line in lines:
-    match = rm.search(line)
+    match = status_line_re.search(line)
     if match and match.groups():
       if match.group(5) != '-': # ignore items that only exist on repos
         atthash = {'status' : match.group(1),
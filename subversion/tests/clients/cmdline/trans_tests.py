@@ -183,12 +183,12 @@ def keywords_from_birth(sbox):
 
   expected_output_tree = svntest.tree.build_generic_tree (status_list)
 
-  svntest.main.run_svn (None, 'add', author_rev_unexp_path)
-  svntest.main.run_svn (None, 'add', author_rev_exp_path)
-  svntest.main.run_svn (None, 'add', bogus_keywords_path)
-  svntest.main.run_svn (None, 'add', embd_author_rev_unexp_path)
-  svntest.main.run_svn (None, 'add', embd_author_rev_exp_path)
-  svntest.main.run_svn (None, 'add', embd_bogus_keywords_path)
+  svntest.main.run_svn (None, 'add', author_rev_unexp_path,
+                        author_rev_exp_path,
+                        bogus_keywords_path,
+                        embd_author_rev_unexp_path,
+                        embd_author_rev_exp_path,
+                        embd_bogus_keywords_path)
 
   svntest.actions.run_and_verify_status(wc_dir, expected_output_tree)
 